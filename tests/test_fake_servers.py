@@ -0,0 +1,110 @@
+import json
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from typofixer.fake_servers import DirectusStub, LLMStub, StubConfig, serve_in_thread
+
+
+def post(url, data):
+    request = Request(url, json.dumps(data).encode(), {"Content-Type": "application/json"})
+    with urlopen(request) as response:
+        return response.read().decode()
+
+
+def get(url):
+    with urlopen(url) as response:
+        return json.loads(response.read())
+
+
+def events(body: str) -> list:
+    return [line[len("data: ") :] for line in body.splitlines() if line.startswith("data: ")]
+
+
+@pytest.fixture
+def llm():
+    server = LLMStub(config=StubConfig(ttft=0, tokens_per_second=10_000))
+    yield server, serve_in_thread(server)
+    server.shutdown()
+
+
+def test_models(llm):
+    _, url = llm
+    assert "gpt-4o-mini" in [m["id"] for m in get(url + "/v1/models")["data"]]
+
+
+def test_openai_stream(llm):
+    _, url = llm
+    body = post(
+        url + "/v1/chat/completions",
+        {
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "user", "content": "Hello world"}],
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        },
+    )
+    *chunks, done = events(body)
+    assert done == "[DONE]"
+    chunks = [json.loads(c) for c in chunks]
+    text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+    assert text == "Hello world"
+    assert chunks[-1]["usage"]["completion_tokens"] == 3
+
+
+def test_anthropic_stream(llm):
+    _, url = llm
+    body = post(
+        url + "/v1/messages",
+        {"model": "claude", "system": "s", "messages": [{"role": "user", "content": "Hi there"}]},
+    )
+    data = [json.loads(e) for e in events(body)]
+    deltas = [d["delta"]["text"] for d in data if d["type"] == "content_block_delta"]
+    assert "".join(deltas) == "Hi there"
+    assert data[-1]["type"] == "message_stop"
+
+
+def test_error_injection(llm):
+    server, url = llm
+    server.config.error_rate = 1
+    with pytest.raises(HTTPError) as error:
+        post(url + "/v1/messages", {"model": "claude", "messages": []})
+    assert error.value.code == 500
+    assert server.counts == {"errors": 1}
+
+
+def test_directus():
+    server = DirectusStub()
+    url = serve_in_thread(server) + "/items/requests"
+    post(url, {"model": "a", "input_tokens": 1, "output_tokens": 2})
+    post(url, {"model": "a", "input_tokens": 3, "output_tokens": 4})
+    post(url, {"model": "b", "input_tokens": 5, "output_tokens": 6})
+
+    assert get(url + "?filter[date_created][_gt]=1970-01-01T00:00:00&aggregate[count]=*") == {
+        "data": [{"count": 3}]
+    }
+    totals = get(url + "?groupBy[]=model&aggregate[sum]=input_tokens&aggregate[sum]=output_tokens")
+    assert totals["data"][0] == {"model": "a", "sum": {"input_tokens": 4, "output_tokens": 6}}
+    assert get(url + "?filter[date_created][_gt]=2999-01-01T00:00:00") == {"data": []}
+    server.shutdown()
+
+
+def test_prompt_cache(llm):
+    _, url = llm
+    request = {
+        "model": "claude",
+        "system": [{"type": "text", "text": "s" * 400, "cache_control": {"type": "ephemeral"}}],
+        "messages": [{"role": "user", "content": "Hi there"}],
+    }
+
+    def usage():
+        return json.loads(events(post(url + "/v1/messages", request))[0])["message"]["usage"]
+
+    assert usage()["cache_read_input_tokens"] == 0
+    assert usage() == {
+        "input_tokens": 3,
+        "output_tokens": 1,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 100,
+    }
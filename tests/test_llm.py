@@ -0,0 +1,44 @@
+import pytest
+
+anthropic = pytest.importorskip("anthropic")
+openai = pytest.importorskip("openai")
+
+from typofixer.fake_servers import LLMStub, StubConfig, serve_in_thread  # noqa: E402
+from typofixer.llm import ai_stream  # noqa: E402
+
+SYSTEM = "Fix the typos in the text. " * 20
+
+
+@pytest.fixture
+def url():
+    server = LLMStub(config=StubConfig(ttft=0, tokens_per_second=10_000))
+    yield serve_in_thread(server)
+    server.shutdown()
+
+
+@pytest.mark.parametrize("model", ["gpt-4o-mini", "claude-3-haiku-20240229"])
+def test_system_prompt_is_cached(url, model):
+    if "claude" in model:
+        client = anthropic.Anthropic(base_url=url, api_key="stub", max_retries=0)
+    else:
+        client = openai.OpenAI(base_url=url + "/v1", api_key="stub", max_retries=0)
+
+    usage = []
+    for _ in range(2):
+        text = "".join(
+            ai_stream(
+                SYSTEM,
+                [dict(role="user", content="Helo world")],
+                model=model,
+                client=client,
+                usage_callback=lambda *args: usage.append(args),
+            )
+        )
+        assert text == "Helo world"
+
+    (first_input, _, first_cached), (second_input, output, second_cached) = usage
+    assert first_cached == 0
+    assert second_cached == len(SYSTEM) // 4
+    # Cached tokens are part of the input tokens.
+    assert first_input == second_input > second_cached
+    assert output == 3
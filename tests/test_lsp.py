@@ -0,0 +1,134 @@
+import io
+import json
+
+import pytest
+
+from typofixer.lsp import Document, Server, hunks, offset_at, paragraphs, position_at
+
+
+def fake_corrector(calls):
+    def correct(text):
+        calls.append(text)
+        return text.replace("teh", "the")
+
+    return correct
+
+
+def test_paragraphs():
+    text = "  Hello world.\nSecond line  \n\n\n Next para\r\n\r\nlast\n"
+    assert paragraphs(text) == [(2, "Hello world.\nSecond line"), (32, "Next para"), (45, "last")]
+
+
+@pytest.mark.parametrize("text", ["I saw teh cat.", "openning", "A text\nwith teh lines?)"])
+def test_hunks_offsets(text):
+    corrected = text.replace("teh", "the").replace("nn", "n").replace("?)", "?")
+    rebuilt = text
+    for offset, old, new in reversed(hunks(text, corrected)):
+        assert rebuilt[offset : offset + len(old)] == old
+        rebuilt = rebuilt[:offset] + new + rebuilt[offset + len(old) :]
+    assert rebuilt == corrected
+
+
+def test_positions():
+    text = "ab\n😀c\r\nd"
+    assert offset_at(text, {"line": 1, "character": 2}) == 4
+    assert position_at(text, 4) == {"line": 1, "character": 2}
+    assert position_at(text, 7) == {"line": 2, "character": 0}
+
+
+def test_incremental_change():
+    document = Document("file:///a", "Hello world\nsecond line")
+    document.apply_change(
+        {
+            "range": {"start": {"line": 1, "character": 0}, "end": {"line": 1, "character": 6}},
+            "text": "third",
+        }
+    )
+    assert document.text == "Hello world\nthird line"
+
+
+def test_only_changed_paragraphs_are_corrected():
+    calls = []
+    document = Document("file:///a", "")
+    assert document.check("I saw teh cat.\n\nAnother one.", fake_corrector(calls)) == [
+        (7, "eh", "he")
+    ]
+    assert calls == ["I saw teh cat.", "Another one."]
+
+    text = "Hi!\n\nI saw teh cat.\n\nAnother one."
+    assert document.check(text, fake_corrector(calls)) == [(12, "eh", "he")]
+    assert calls == ["I saw teh cat.", "Another one.", "Hi!"]
+
+
+def message(**content):
+    body = json.dumps({"jsonrpc": "2.0", **content}).encode()
+    return f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+
+
+def read_messages(data: bytes) -> list[dict]:
+    stream = io.BytesIO(data)
+    server = Server(lambda text: text, stream, io.BytesIO())
+    messages = []
+    while (msg := server.read_message()) is not None:
+        messages.append(msg)
+    return messages
+
+
+def test_server():
+    uri = "file:///a.txt"
+    stdin = io.BytesIO(
+        message(id=1, method="initialize", params={})
+        + message(
+            method="textDocument/didOpen",
+            params={"textDocument": {"uri": uri, "text": "I saw teh cat.", "version": 1}},
+        )
+        + message(id=2, method="unknown", params={})
+    )
+    stdout = io.BytesIO()
+    server = Server(fake_corrector([]), stdin, stdout, debounce=60)
+    server.serve()
+
+    document = server.documents[uri]
+    document.timer.cancel()
+    server.publish(document)
+
+    init, unknown, diagnostics = read_messages(stdout.getvalue())
+    assert init["result"]["capabilities"]["textDocumentSync"]["change"] == 2
+    assert unknown["error"]["code"] == -32601
+    [diagnostic] = diagnostics["params"]["diagnostics"]
+    assert diagnostic["range"]["start"] == {"line": 0, "character": 7}
+    assert diagnostic["data"] == {"new": "he"}
+
+    [action] = server.on_textDocument_codeAction(
+        {"textDocument": {"uri": uri}, "context": {"diagnostics": [diagnostic]}}
+    )
+    assert action["edit"]["changes"][uri][0]["newText"] == "he"
+
+
+def test_bad_messages_dont_kill_the_server():
+    stdin = io.BytesIO(
+        message(
+            method="textDocument/didChange",
+            params={"textDocument": {"uri": "file:///never-opened"}, "contentChanges": []},
+        )
+        + message(
+            id=1,
+            method="textDocument/codeAction",
+            params={"textDocument": {"uri": "file:///a"}},
+        )
+        + message(
+            id=2,
+            method="textDocument/codeAction",
+            params={
+                "textDocument": {"uri": "file:///a"},
+                "context": {"diagnostics": [{"source": "typofixer", "range": {}}]},
+            },
+        )
+    )
+    stdout = io.BytesIO()
+    Server(fake_corrector([]), stdin, stdout).serve()
+
+    log, error, actions = read_messages(stdout.getvalue())
+    assert log["method"] == "window/logMessage"
+    assert error["error"]["code"] == -32603
+    assert actions["result"] == []
@@ -0,0 +1,77 @@
+import pytest
+
+from typofixer import precheck as precheck_module
+from typofixer.precheck import WordIndex, edit_distance, load_index, precheck
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("the\ncat\nis\non\nmat\nmap\n")
+    return WordIndex(path)
+
+
+@pytest.mark.parametrize(
+    "a,b,expected",
+    [("cat", "cat", 0), ("cat", "cats", 1), ("cat", "act", 1), ("cat", "dog", 3)],
+)
+def test_edit_distance(a, b, expected):
+    assert edit_distance(a, b) == expected
+
+
+def test_suggest(index):
+    assert index.suggest("teh") == ["the"]
+    assert index.suggest("ma") == ["mat", "map"]
+    assert index.suggest("zebra") == []
+
+
+def test_precheck_clean(index):
+    text = "The cat is on the mat."
+    assert precheck(text, index=index) == text
+
+
+def test_precheck_needs_llm(index, monkeypatch):
+    monkeypatch.setattr(precheck_module, "TRUSTED_SIZE", 0)
+    assert precheck("The cat is on teh mat.", index=index) is None
+    assert precheck("The cat is on the ma.", fix_trivial=True, index=index) is None
+    assert precheck("The cat is on Zebra.", fix_trivial=True, index=index) is None
+
+
+def test_precheck_trivial_fix(index, monkeypatch):
+    monkeypatch.setattr(precheck_module, "TRUSTED_SIZE", 0)
+    text = "The cta is on teh mat."
+    corrected = precheck(text, fix_trivial=True, index=index)
+    assert corrected == "The cat is on the mat."
+
+
+def test_inflections_are_known(index):
+    assert "cats" in index
+    assert "mapped" in index
+    assert "teh" not in index
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["I like cats.", "The tests pass.", "She walked home and kept running."],
+)
+def test_bundled_list_keeps_correct_text(text):
+    assert precheck(text, fix_trivial=True, index=load_index()) in (text, None)
+
+
+def test_bundled_list_is_too_small_to_fix():
+    # Local fixes need a real frequency dictionary.
+    assert precheck("I think we shuold meet.", fix_trivial=True, index=load_index()) is None
+
+
+@pytest.mark.parametrize("word", ["wass", "iss", "hass", "thes", "beed", "ofs", "ared"])
+def test_typos_are_not_inflections(word):
+    assert word not in load_index()
+
+
+@pytest.mark.parametrize("word", ["cats", "tests", "walked", "running", "boxes", "classes"])
+def test_inflections_of_bundled_words(word):
+    assert word in load_index()
+
+
+def test_doubled_letter_typo_needs_llm():
+    assert precheck("He wass here.", index=load_index()) is None
@@ -0,0 +1,58 @@
+import pytest
+
+from typofixer.router import Router
+
+COSTS = {"cheap": (0.1, 0.1), "fast": (1, 1), "pricey": (100, 100)}
+TIERS = {"cheap": 1, "fast": 2, "pricey": 3}
+
+
+def test_pick_untried_first():
+    router = Router(COSTS, TIERS)
+    router.record("cheap", ttft=0.1, tokens_per_second=100)
+    assert router.pick(["cheap", "fast"], input_tokens=100) == "fast"
+
+
+def test_pick_fastest():
+    router = Router(COSTS, TIERS)
+    router.record("cheap", ttft=1, tokens_per_second=50)
+    router.record("fast", ttft=0.2, tokens_per_second=200)
+    assert router.pick(["cheap", "fast"], input_tokens=100) == "fast"
+
+
+def test_pick_respects_tier_and_cost():
+    router = Router(COSTS, TIERS)
+    assert router.pick(COSTS, input_tokens=1000, min_tier=2, max_cost=0.01) == "fast"
+    with pytest.raises(ValueError):
+        router.pick(COSTS, input_tokens=1000, min_tier=3, max_cost=0.01)
+
+
+def test_errors_slow_down_a_model():
+    router = Router(COSTS, TIERS)
+    router.record("fast", ttft=0.2, tokens_per_second=200)
+    router.record("fast", ttft=0, tokens_per_second=0, error=True)
+    router.record("fast", ttft=0, tokens_per_second=0, error=True)
+    router.record("cheap", ttft=1, tokens_per_second=50)
+    assert router.pick(["cheap", "fast"], input_tokens=100) == "cheap"
+
+
+def test_timed():
+    times = iter([0, 0.5, 1.5, 1.5])
+    router = Router(COSTS, TIERS, clock=lambda: next(times))
+    assert "".join(router.timed("fast", ["a" * 40, "b" * 40])) == "a" * 40 + "b" * 40
+    stats = router.stats["fast"]
+    assert stats.ttft == 0.5
+    assert stats.tokens_per_second == 20
+
+
+def test_failing_model_is_tried_again_later():
+    now = [0]
+    router = Router(COSTS, TIERS, max_age=60, clock=lambda: now[0])
+    router.record("fast", ttft=0, tokens_per_second=0, error=True)
+    router.record("cheap", ttft=1, tokens_per_second=50)
+    assert router.pick(["cheap", "fast"], input_tokens=100) == "cheap"
+
+    now[0] = 30
+    router.record("cheap", ttft=1, tokens_per_second=50)
+    now[0] = 61
+    # The error is forgotten, so "fast" is measured again.
+    assert router.pick(["cheap", "fast"], input_tokens=100) == "fast"
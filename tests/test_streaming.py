@@ -0,0 +1,24 @@
+from typofixer.streaming import coalesce
+
+
+def fake_clock(times):
+    it = iter(times)
+    return lambda: next(it)
+
+
+def test_coalesce_by_time():
+    chunks = ["a", "b", "c", "d", "e"]
+    # First call is the start time, then one call per chunk.
+    clock = fake_clock([0, 0.01, 0.02, 0.06, 0.07, 0.2])
+    assert list(coalesce(chunks, fps=20, clock=clock)) == ["abc", "de"]
+
+
+def test_coalesce_by_chars():
+    chunks = ["ab", "cd", "ef", "g"]
+    frames = list(coalesce(chunks, fps=1, max_chars=4, clock=lambda: 0))
+    assert frames == ["abcd", "efg"]
+
+
+def test_coalesce_keeps_everything():
+    chunks = [str(i) for i in range(100)]
+    assert "".join(coalesce(chunks)) == "".join(chunks)
@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+import sys
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("requests")
+
+# The app imports its modules by name, as streamlit runs main.py as a script.
+sys.path.insert(0, str(Path(__file__).parent.parent / "typofixer"))
+
+import constants  # noqa: E402
+from usage import FileUsageTracker, Usage  # noqa: E402
+
+
+def test_total_cost_with_cached_tokens(tmp_path):
+    log_file = tmp_path / "logs.jsonl"
+    # Records from before cached tokens were tracked.
+    old_record = {"model": "gpt-4o-mini", "input_tokens": 1_000_000, "output_tokens": 0}
+    log_file.write_text(json.dumps({**old_record, "date_created": 1}) + "\n")
+    tracker = FileUsageTracker(str(log_file))
+    tracker.log_call("gpt-4o-mini", "a", "b", 1_000_000, 1_000_000, cached_input_tokens=1_000_000)
+
+    assert tracker.total_usage(0) == {"gpt-4o-mini": Usage(2_000_000, 1_000_000, 1_000_000)}
+    input_cost, output_cost = constants.MODELS_COSTS["gpt-4o-mini"]
+    cached_cost = constants.MODELS_CACHED_INPUT_COSTS["gpt-4o-mini"]
+    assert cached_cost == input_cost / 2
+    assert tracker.total_cost(0) == pytest.approx(input_cost + cached_cost + output_cost)
+
+
+def test_cost_estimation_with_cached_system_prompt():
+    pytest.importorskip("tiktoken")
+    from cost_estimation import CostEstimation
+
+    messages = [
+        dict(role="system", content="Fix the typos in the text. " * 20),
+        dict(role="user", content="Helo world"),
+    ]
+    uncached = CostEstimation.estimate(messages, "gpt-4o-mini")
+    cached = CostEstimation.estimate(messages, "gpt-4o-mini", cached_messages=1)
+    system_tokens = CostEstimation.estimate(messages[:1], "gpt-4o-mini").input_tokens
+
+    assert uncached.cached_tokens == 0
+    assert cached.cached_tokens == system_tokens
+    assert cached.input_tokens == uncached.input_tokens
+    cached_price = constants.MODELS_CACHED_INPUT_COSTS["gpt-4o-mini"] / 1_000_000
+    input_price = constants.MODELS_COSTS["gpt-4o-mini"][0] / 1_000_000
+    assert cached.input_cost == pytest.approx(
+        uncached.input_cost - system_tokens * (input_price - cached_price)
+    )
@@ -0,0 +1,88 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from typofixer.usage_store import (  # noqa: E402
+    ColumnarUsageStore,
+    cost_per_day,
+    parse_directus_date,
+    histogram_by_time,
+    percentiles,
+)
+
+
+def record(date, model="a", tokens=10):
+    return dict(
+        date_created=date,
+        model=model,
+        input_length=tokens * 4,
+        output_length=tokens * 4,
+        input_tokens=tokens,
+        output_tokens=tokens,
+    )
+
+
+def test_append_and_read(tmp_path):
+    store = ColumnarUsageStore(tmp_path)
+    store.append([record(10), record(20, "b")])
+    store.append([record("1970-01-01T00:00:30.000Z")])
+
+    store = ColumnarUsageStore(tmp_path)
+    assert len(store) == 3
+    assert store.models == ["a", "b"]
+    assert store.columns()["date_created"].tolist() == [10, 20, 30]
+    columns = store.columns(since=10)
+    assert columns["date_created"].tolist() == [20, 30]
+    assert columns["model"].tolist() == [1, 0]
+    assert store.last_date() == 30
+
+
+def test_parse_directus_date():
+    assert parse_directus_date("1970-01-01T00:01:00") == 60
+    assert parse_directus_date("1970-01-01T00:01:00.250Z") == 60.25
+
+
+def test_last_date_of_empty_store(tmp_path):
+    assert ColumnarUsageStore(tmp_path).last_date() == 0
+
+
+def test_histogram_by_time():
+    starts, counts = histogram_by_time(np.array([3600.0, 3700, 3 * 3600 + 1]))
+    assert starts.tolist() == [3600, 7200, 10800]
+    assert counts.tolist() == [2, 0, 1]
+
+
+def test_percentiles():
+    assert percentiles(np.arange(101), q=(50, 90)) == {50: 50, 90: 90}
+
+
+def test_cost_per_day(tmp_path):
+    store = ColumnarUsageStore(tmp_path)
+    store.append([record(0, "a", 1_000_000), record(10, "b", 1_000_000), record(86400, "a")])
+    days, costs = cost_per_day(store, {"a": (1, 2), "b": (0, 1)})
+    assert days.tolist() == [0, 86400]
+    assert costs["a"].tolist() == pytest.approx([3, 3e-5])
+    assert costs["b"].tolist() == [1, 0]
+
+
+def test_column_added_after_records(tmp_path):
+    store = ColumnarUsageStore(tmp_path)
+    store.append([record(10), record(20)])
+    store.column_path("cached_input_tokens").unlink()  # Like a store from before the column
+    assert store.columns()["cached_input_tokens"].tolist() == [0, 0]
+
+    store.append([{**record(30), "cached_input_tokens": 5}])
+    assert store.columns()["cached_input_tokens"].tolist() == [0, 0, 5]
+
+
+def test_cost_per_day_of_cached_tokens(tmp_path):
+    store = ColumnarUsageStore(tmp_path)
+    store.append(
+        [
+            {**record(10, "a", 1_000_000), "cached_input_tokens": 500_000},
+            {**record(20, "b", 1_000_000), "cached_input_tokens": 1_000_000},
+        ]
+    )
+    _, costs = cost_per_day(store, {"a": (1, 2), "b": (4, 0)}, cached_costs={"a": 0.1})
+    assert costs["a"].tolist() == pytest.approx([2.55])
+    assert costs["b"].tolist() == [4]
@@ -3,7 +3,38 @@ from pathlib import Path
 import sys
 
 
+def check():
+    """Check the text from the given file (or stdin) without any LLM."""
+
+    from typofixer.formatting import fmt_diff, mk_diff
+    from typofixer.precheck import find_typos, load_index, precheck
+
+    text = Path(sys.argv[2]).read_text() if len(sys.argv) > 2 else sys.stdin.read()
+
+    corrected = precheck(text, fix_trivial=True)
+    if corrected == text:
+        print("No issues found.")
+    elif corrected is not None:
+        print(fmt_diff(iter(mk_diff(text, corrected)))[1])
+    elif (index := load_index()) is None:
+        print("No word list found, set TYPOFIXER_WORDLIST.")
+        sys.exit(1)
+    else:
+        for typo in find_typos(text, index):
+            suggestions = ", ".join(typo.suggestions) or "?"
+            print(f"{typo.start}: {typo.word} -> {suggestions}")
+        print("Some words need an LLM to be fixed.")
+        sys.exit(1)
+
+
 def cli():
+    if sys.argv[1:2] == ["check"]:
+        return check()
+    if sys.argv[1:2] == ["lsp"]:
+        from typofixer.lsp import main
+
+        return main()
+
     python_executable = sys.executable
     args = [
         python_executable,
@@ -0,0 +1,17 @@
+from pathlib import Path
+
+from pydantic import BaseModel
+import yaml
+
+
+class Config(BaseModel):
+    api_base: str | None = None
+    api_key: str | None = None
+
+    @classmethod
+    def load(cls, path: str) -> "Config":
+        try:
+            data = yaml.safe_load(Path(path).read_text())
+            return cls.model_validate(data)
+        except FileNotFoundError:
+            return cls()
@@ -6,6 +6,30 @@ dotenv.load_dotenv()
 MAX_CHARS = 6000
 CONFIG_PATH = os.getenv("CONFIG_PATH", "./config.yaml")
 
+SYSTEM_PROMPTS = {
+    "Fix typos": """
+        You are given a text and you need to fix the language (typos, grammar, ...).
+        If needed, fix the formatting and, when relevant, ensure the text is inclusive.
+        Output directly the corrected text, without any comment.
+        """,
+    "Heavy fix": """
+        You are given a text and you need to fix the language (typos, grammar, ...).
+        If needed, fix the formatting and, when relevant, ensure the text is inclusive.
+        Please also reformulate the text when needed, use better words and make it more clear.
+        Output directly the corrected text, without any comment.
+        """,
+    "Custom": "",
+}
+
+# How often the streamed answer is redrawn: at most STREAM_FPS times per second,
+# or as soon as STREAM_MAX_CHARS new characters arrived.
+STREAM_FPS = float(os.getenv("TYPOFIXER_STREAM_FPS", "20"))
+STREAM_MAX_CHARS = int(os.getenv("TYPOFIXER_STREAM_MAX_CHARS", "200"))
+# Opt-in: check texts against a word list before calling the LLM, and optionally fix obvious
+# typos locally. A word list can't judge grammar or style, so texts it finds clean skip those.
+PRECHECK = bool(os.getenv("TYPOFIXER_PRECHECK"))
+PRECHECK_FIX_TRIVIAL = bool(os.getenv("TYPOFIXER_PRECHECK_FIX_TRIVIAL"))
+
 OPENAI_MODEL = "gpt-4o-2024-08-06"
 ANTHROPIC_MODEL = "claude-3-opus-20240229"
 ANTHROPIC_MODEL = "claude-3-sonnet-20240229"
@@ -22,4 +46,23 @@ MODELS_COSTS = {
     "claude-3-sonnet-20240229": (3, 15),
     "claude-3-haiku-20240229": (0.25, 1.25),
 }
+# Input cost of tokens read from the prompt cache: 10% of the price for Anthropic, 50% for OpenAI.
+MODELS_CACHED_INPUT_COSTS = {
+    model: input_cost * (0.1 if "claude" in model else 0.5)
+    for model, (input_cost, _) in MODELS_COSTS.items()
+}
 MODELS = list(MODELS_COSTS)
+# Quality tier of each model, higher is better. Only models with a tier are used by the "auto" model.
+MODELS_TIERS = {
+    "claude-3-5-sonnet-20240620": 3,
+    "gpt-4o": 3,
+    "gpt-4o-2024-08-06": 3,
+    "claude-3-opus-20240229": 3,
+    "claude-3-sonnet-20240229": 2,
+    "gpt-4o-mini": 2,
+    "gpt-3.5-turbo": 1,
+    "claude-3-haiku-20240229": 1,
+}
+AUTO_MODEL = "auto"
+AUTO_MIN_TIER = int(os.getenv("TYPOFIXER_AUTO_MIN_TIER", "2"))
+AUTO_MAX_COST = float(os.getenv("TYPOFIXER_AUTO_MAX_COST", "0.05"))  # $ per request
@@ -9,21 +9,30 @@ class CostEstimation:
     input_cost: float
     output_cost: float
     is_approximate: bool
+    cached_tokens: int = 0
 
     def __str__(self):
+        cached = f" ({self.cached_tokens} cached)" if self.cached_tokens else ""
         return (
-            f"Cost for {self.input_tokens} tokens: "
+            f"Cost for {self.input_tokens} tokens{cached}: "
             f"{self.input_cost:.4f}$ + "
             f"{self.output_cost * 1000:.4f}$/1k output tokens"
         )
 
     @classmethod
-    def estimate(cls, messages: list[dict], model: str) -> "CostEstimation":
-        """Estimate the cost of the AI completion."""
+    def estimate(
+        cls, messages: list[dict], model: str, cached_messages: int = 0
+    ) -> "CostEstimation":
+        """Estimate the cost of the AI completion.
+
+        The first `cached_messages` messages (usually the system prompt) are priced
+        as read from the prompt cache.
+        """
 
         import tiktoken
 
         input_cost, output_cost = constants.MODELS_COSTS[model]
+        cached_cost = constants.MODELS_CACHED_INPUT_COSTS.get(model, input_cost)
 
         try:
             encoding = tiktoken.encoding_for_model(model)
@@ -35,13 +44,19 @@ class CostEstimation:
             approx = True
 
         input_tokens = 0
-        for msg in messages:
-            input_tokens += len(encoding.encode(msg["content"]))
-            input_tokens += 4  # for the role and the separator
+        cached_tokens = 0
+        for i, msg in enumerate(messages):
+            tokens = len(encoding.encode(msg["content"])) + 4  # for the role and the separator
+            input_tokens += tokens
+            if i < cached_messages:
+                cached_tokens += tokens
+
+        total_input_cost = input_cost * (input_tokens - cached_tokens) + cached_cost * cached_tokens
 
         return cls(
             input_tokens=input_tokens,
-            input_cost=input_cost * input_tokens / 1_000_000,
+            input_cost=total_input_cost / 1_000_000,
             output_cost=output_cost / 1_000_000,
             is_approximate=approx,
+            cached_tokens=cached_tokens,
         )
@@ -0,0 +1,328 @@
+"""Local fakes of the LLM providers and of Directus, for load tests that cost nothing.
+
+The LLM stub speaks enough of the OpenAI (`/v1/models`, `/v1/chat/completions`)
+and Anthropic (`/v1/messages`) APIs for their SDKs to stream from it. It answers
+with the last user message, so the "correction" is as long as the input.
+System prompts seen before are reported as read from the prompt cache.
+
+Run both with `python typofixer/fake_servers.py`.
+"""
+
+import argparse
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class StubConfig:
+    ttft: float = 0.2  # seconds before the first token
+    tokens_per_second: float = 200
+    error_rate: float = 0.0  # probability to answer with an error instead
+    error_status: int = 500
+    chars_per_token: int = 4
+    models: list[str] = field(
+        default_factory=lambda: ["gpt-4o-mini", "gpt-4o", "claude-3-haiku-20240229"]
+    )
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Too noisy under load
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def send_json(self, data, status: int = 200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def send_event(self, data, event: str | None = None):
+        payload = data if isinstance(data, str) else json.dumps(data)
+        message = (f"event: {event}\n" if event else "") + f"data: {payload}\n\n"
+        self.wfile.write(message.encode())
+        self.wfile.flush()
+
+
+class LLMStubHandler(JSONHandler):
+    server: "LLMStub"
+
+    def do_GET(self):
+        if urlparse(self.path).path.rstrip("/") == "/v1/models":
+            models = [
+                {"id": model, "object": "model", "created": 0, "owned_by": "stub"}
+                for model in self.server.config.models
+            ]
+            self.send_json({"object": "list", "data": models})
+        else:
+            self.send_json({"error": {"message": "Not found"}}, 404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        request = self.read_json()
+        config = self.server.config
+
+        if random.random() < config.error_rate:
+            self.server.count("errors")
+            error = {"type": "error", "error": {"type": "api_error", "message": "Injected error"}}
+            return self.send_json(error, config.error_status)
+
+        if path == "/v1/chat/completions":
+            self.server.count("openai")
+            self.stream_openai(request)
+        elif path == "/v1/messages":
+            self.server.count("anthropic")
+            self.stream_anthropic(request)
+        else:
+            self.send_json({"error": {"message": "Not found"}}, 404)
+
+    def answer(self, request: dict) -> tuple[int, int, list[str]]:
+        """Return the number of input tokens, how many are cached, and the tokens of the answer."""
+
+        def text_of(content) -> str:
+            if isinstance(content, str):
+                return content
+            return "".join(block.get("text", "") for block in content)
+
+        size = self.server.config.chars_per_token
+        messages = request["messages"]
+        if "system" in request:
+            # Anthropic: only blocks marked with cache_control are cached.
+            system = request["system"]
+            cacheable = isinstance(system, list) and any("cache_control" in b for b in system)
+            prefix = text_of(system)
+        else:
+            # OpenAI: the system prompt is always cached automatically.
+            cacheable = bool(messages) and messages[0]["role"] == "system"
+            prefix = text_of(messages[0]["content"]) if cacheable else ""
+            messages = messages[1:] if cacheable else messages
+
+        input_tokens = (len(prefix) + sum(len(text_of(m["content"])) for m in messages)) // size + 1
+        cached_tokens = 0
+        if cacheable and prefix and self.server.cache_lookup(hashlib.sha256(prefix.encode())):
+            cached_tokens = len(prefix) // size
+
+        text = text_of(messages[-1]["content"]) if messages else ""
+        tokens = [text[i : i + size] for i in range(0, len(text), size)]
+        return input_tokens, cached_tokens, tokens
+
+    def stream_tokens(self, tokens: list[str]):
+        config = self.server.config
+        time.sleep(config.ttft)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(1 / config.tokens_per_second)
+            yield token
+
+    def stream_openai(self, request: dict):
+        input_tokens, cached_tokens, tokens = self.answer(request)
+        base = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request["model"],
+        }
+
+        def chunk(delta, finish_reason=None):
+            choice = {"index": 0, "delta": delta, "finish_reason": finish_reason}
+            return {**base, "choices": [choice]}
+
+        self.start_events()
+        self.send_event(chunk({"role": "assistant", "content": ""}))
+        for token in self.stream_tokens(tokens):
+            self.send_event(chunk({"content": token}))
+        self.send_event(chunk({}, "stop"))
+        if request.get("stream_options", {}).get("include_usage"):
+            usage = {
+                "prompt_tokens": input_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": input_tokens + len(tokens),
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            }
+            self.send_event({**base, "choices": [], "usage": usage})
+        self.send_event("[DONE]")
+
+    def stream_anthropic(self, request: dict):
+        input_tokens, cached_tokens, tokens = self.answer(request)
+        # Anthropic reports uncached, written and read tokens separately.
+        usage = {
+            "input_tokens": input_tokens - cached_tokens,
+            "output_tokens": 1,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": cached_tokens,
+        }
+        message = {
+            "id": "msg_stub",
+            "type": "message",
+            "role": "assistant",
+            "content": [],
+            "model": request["model"],
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": usage,
+        }
+
+        self.start_events()
+        self.send_event({"type": "message_start", "message": message}, "message_start")
+        block = {"type": "text", "text": ""}
+        self.send_event(
+            {"type": "content_block_start", "index": 0, "content_block": block},
+            "content_block_start",
+        )
+        for token in self.stream_tokens(tokens):
+            delta = {"type": "text_delta", "text": token}
+            self.send_event(
+                {"type": "content_block_delta", "index": 0, "delta": delta}, "content_block_delta"
+            )
+        self.send_event({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        end = {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": len(tokens)},
+        }
+        self.send_event(end, "message_delta")
+        self.send_event({"type": "message_stop"}, "message_stop")
+
+
+class DirectusStubHandler(JSONHandler):
+    server: "DirectusStub"
+
+    def collection(self) -> list[dict] | None:
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "items":
+            self.send_json({"errors": [{"message": "Not found"}]}, 404)
+            return None
+        return self.server.items.setdefault(parts[1], [])
+
+    def do_POST(self):
+        items = self.collection()
+        if items is None:
+            return
+        item = self.read_json()
+        # Directus dates have a millisecond precision.
+        now = datetime.now(timezone.utc)
+        milliseconds = now.microsecond // 1000
+        item["date_created"] = now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{milliseconds:03d}Z"
+        with self.server.lock:
+            item["id"] = len(items) + 1
+            items.append(item)
+        self.send_json({"data": item})
+
+    def do_GET(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "fields":
+            # Any field exists, as items are stored as they come.
+            return self.send_json({"data": {"collection": parts[1], "field": parts[2]}})
+
+        items = self.collection()
+        if items is None:
+            return
+        query = parse_qs(urlparse(self.path).query)
+
+        since = query.get("filter[date_created][_gt]", [""])[0]
+        with self.server.lock:
+            items = [item for item in items if item["date_created"].rstrip("Z") > since]
+
+        if "aggregate[count]" in query:
+            return self.send_json({"data": [{"count": len(items)}]})
+
+        sums = query.get("aggregate[sum]", [])
+        if sums:
+            groups: dict[tuple, list[dict]] = {}
+            group_by = query.get("groupBy[]", [])
+            for item in items:
+                groups.setdefault(tuple(item.get(g) for g in group_by), []).append(item)
+            data = [
+                {
+                    **dict(zip(group_by, key)),
+                    "sum": {f: sum(item.get(f, 0) for item in group) for f in sums},
+                }
+                for key, group in groups.items()
+            ]
+            return self.send_json({"data": data})
+
+        self.send_json({"data": items})
+
+
+class LLMStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), config: StubConfig | None = None):
+        super().__init__(address, LLMStubHandler)
+        self.config = config or StubConfig()
+        self.counts: dict[str, int] = {}
+        self.cache: set[str] = set()
+        self.lock = threading.Lock()
+
+    def count(self, name: str):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def cache_lookup(self, prefix_hash) -> bool:
+        """Return whether the prefix was already cached, and cache it."""
+
+        key = prefix_hash.hexdigest()
+        with self.lock:
+            hit = key in self.cache
+            self.cache.add(key)
+            return hit
+
+
+class DirectusStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        super().__init__(address, DirectusStubHandler)
+        self.items: dict[str, list[dict]] = {}
+        self.lock = threading.Lock()
+
+
+def serve_in_thread(server: ThreadingHTTPServer) -> str:
+    """Start the server in the background and return its url."""
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--llm-port", type=int, default=9200)
+    parser.add_argument("--directus-port", type=int, default=9201)
+    parser.add_argument("--ttft", type=float, default=StubConfig.ttft)
+    parser.add_argument("--tokens-per-second", type=float, default=StubConfig.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        ttft=args.ttft, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate
+    )
+    llm_url = serve_in_thread(LLMStub(("127.0.0.1", args.llm_port), config))
+    directus_url = serve_in_thread(DirectusStub(("127.0.0.1", args.directus_port)))
+    print(f"LLM stub: {llm_url}\nDirectus stub: {directus_url}")
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,11 +12,17 @@ def ai_stream(
     system: str,
     messages: list[dict[str, str]],
     model: str,
-    usage_callback: Callable[[int, int], None] = lambda x, y: None,
+    usage_callback: Callable[[int, int, int], None] = lambda x, y, z: None,
     client=None,
     **kwargs,
 ) -> Generator[str, None, None]:
-    """Stream with the AI using the given messages."""
+    """Stream with the AI using the given messages.
+
+    The system prompt is always sent first and marked as cacheable, so that repeated
+    prompts are read from the provider's prompt cache.
+    `usage_callback` receives the input tokens, the output tokens and how many of
+    the input tokens were read from the cache.
+    """
 
     new_kwargs = dict(
         max_tokens=1000,
@@ -29,18 +35,25 @@ def ai_stream(
         if messages[-1]["role"] == "assistant":
             yield messages[-1]["content"]
 
-        with (client or anthropic_client).messages.stream(
+        with (client or anthropic_client).beta.prompt_caching.messages.stream(
             model=model,
             messages=messages,
-            system=system,
+            system=[dict(type="text", text=system, cache_control=dict(type="ephemeral"))],
             **kwargs,
         ) as stream:
             for text in stream.text_stream:
                 yield text
 
             usage = stream.get_final_message().usage
-            usage_callback(usage.input_tokens, usage.output_tokens)
+            # Anthropic counts tokens read from or written to the cache separately.
+            cache_read = usage.cache_read_input_tokens or 0
+            cache_write = usage.cache_creation_input_tokens or 0
+            usage_callback(
+                usage.input_tokens + cache_read + cache_write, usage.output_tokens, cache_read
+            )
     else:
+        # OpenAI-compatible APIs cache the longest common prefix automatically,
+        # so the fixed system prompt goes first and the text to fix last.
         response = (client or openai).chat.completions.create(
             model=model,
             messages=[
@@ -55,7 +68,13 @@ def ai_stream(
         for chunk in response:
             if not chunk.choices:
                 # This is the last chunk, with the usage
-                usage_callback(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+                # A plain dict before openai 1.51, which added the field to the model.
+                details = getattr(chunk.usage, "prompt_tokens_details", None)
+                if isinstance(details, dict):
+                    cached = details.get("cached_tokens") or 0
+                else:
+                    cached = getattr(details, "cached_tokens", None) or 0
+                usage_callback(chunk.usage.prompt_tokens, chunk.usage.completion_tokens, cached)
             else:
                 text = chunk.choices[0].delta.content
                 if text is not None:
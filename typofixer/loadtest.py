@@ -0,0 +1,129 @@
+"""Measure how many corrections per second the service sustains, against local fake servers.
+
+Each session repeatedly streams a correction with `ai_stream` and logs it with
+a `DirectusUsageTracker`, like one user of the app.
+
+    python typofixer/loadtest.py --sessions 50 --requests 10
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import resource
+import statistics
+import threading
+import time
+
+import anthropic
+import openai
+
+from fake_servers import DirectusStub, LLMStub, StubConfig, serve_in_thread
+from llm import ai_stream
+from usage import DirectusUsageTracker
+
+
+@dataclass
+class Results:
+    ttft: list[float] = field(default_factory=list)
+    latency: list[float] = field(default_factory=list)
+    output_tokens: int = 0
+    errors: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def max_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(values: list[float]) -> str:
+    if len(values) < 2:
+        return "not enough data"
+    q = statistics.quantiles(values, n=100)
+    return f"p50 {q[49] * 1000:.0f}ms, p90 {q[89] * 1000:.0f}ms, p99 {q[98] * 1000:.0f}ms"
+
+
+def session(
+    results: Results, requests: int, model: str, client, tracker: DirectusUsageTracker, text: str
+):
+    system = "Fix the typos."
+    messages = [dict(role="user", content=text)]
+
+    for _ in range(requests):
+        usage = []
+        start = time.perf_counter()
+        ttft = None
+        try:
+            corrected = ""
+            for chunk in ai_stream(
+                system,
+                messages,
+                model=model,
+                client=client,
+                usage_callback=lambda i, o, c: usage.append((i, o, c)),
+            ):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                corrected += chunk
+            input_tokens, output_tokens, cached_tokens = usage[0] if usage else (0, 0, 0)
+            tracker.log_call(model, text, corrected, input_tokens, output_tokens, cached_tokens)
+        except Exception:
+            with results.lock:
+                results.errors += 1
+            continue
+
+        with results.lock:
+            results.ttft.append(ttft or 0)
+            results.latency.append(time.perf_counter() - start)
+            results.output_tokens += output_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent users")
+    parser.add_argument("--requests", type=int, default=10, help="Requests per session")
+    parser.add_argument("--model", default="gpt-4o-mini", help="Use a claude model for Anthropic")
+    parser.add_argument("--chars", type=int, default=2000, help="Length of each text to fix")
+    parser.add_argument("--ttft", type=float, default=StubConfig.ttft)
+    parser.add_argument("--tokens-per-second", type=float, default=StubConfig.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    parser.add_argument("--llm-url", help="Use an already running LLM stub")
+    parser.add_argument("--directus-url", help="Use an already running Directus stub")
+    args = parser.parse_args()
+
+    # Running the stubs in another process (fake_servers.py) keeps them out of the measure.
+    config = StubConfig(
+        ttft=args.ttft, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate
+    )
+    llm_url = args.llm_url or serve_in_thread(LLMStub(config=config))
+    directus_url = args.directus_url or serve_in_thread(DirectusStub())
+
+    if "claude" in args.model:
+        client = anthropic.Anthropic(base_url=llm_url, api_key="stub", max_retries=0)
+    else:
+        client = openai.OpenAI(base_url=llm_url + "/v1", api_key="stub", max_retries=0)
+    tracker = DirectusUsageTracker(directus_url, "typofixer_requests", "stub")
+    text = ("Thsi is a sentense with typos. " * (args.chars // 31 + 1))[: args.chars]
+
+    results = Results()
+    # tracemalloc would slow down every allocation, so only the peak RSS is measured.
+    rss_before = max_rss_mib()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.sessions) as pool:
+        for _ in range(args.sessions):
+            pool.submit(session, results, args.requests, args.model, client, tracker, text)
+    duration = time.perf_counter() - start
+    rss_after = max_rss_mib()
+
+    done = len(results.latency)
+    print(f"{done} requests in {duration:.2f}s, {results.errors} errors")
+    tokens_per_second = results.output_tokens / duration
+    print(f"Throughput: {done / duration:.1f} req/s, {tokens_per_second:.0f} tokens/s")
+    print(f"Time to first token: {percentiles(results.ttft)}")
+    print(f"Latency: {percentiles(results.latency)}")
+    print(f"Requests logged: {tracker.requests_count(0)}")
+    print(f"Memory: {rss_after:.0f} MiB max RSS, +{rss_after - rss_before:.0f} MiB during the run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Language server, to fix typos directly in editors.
+
+Documents are synced incrementally and checked paragraph by paragraph, a short
+while after the last edit. Paragraphs are cached by content hash, so only the
+ones that changed since the last check are sent to the LLM.
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from textwrap import dedent
+from typing import BinaryIO, Callable
+
+from typofixer.formatting import mk_diff, pair_up_diff
+
+DEBOUNCE_SECONDS = float(os.getenv("TYPOFIXER_LSP_DEBOUNCE", "1.0"))
+
+# Shortest run of text, starting and ending with non-space, followed by a blank line or the end.
+PARAGRAPH_RE = re.compile(r"\S(?:.*?\S)??(?=[ \t]*(?:\r?\n|\r)\s*(?:\r?\n|\r)|\s*\Z)", re.S)
+
+# LSP error codes
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+# LSP TextDocumentSyncKind
+INCREMENTAL = 2
+
+
+def line_starts(text: str) -> list[int]:
+    return [0] + [m.end() for m in re.finditer(r"\r\n|\r|\n", text)]
+
+
+def offset_at(text: str, position: dict, starts: list[int] | None = None) -> int:
+    """Convert a LSP position, counted in UTF-16 code units, to an index in the text."""
+
+    starts = starts or line_starts(text)
+    if position["line"] >= len(starts):
+        return len(text)
+
+    offset = starts[position["line"]]
+    units = position["character"]
+    while units > 0 and offset < len(text) and text[offset] not in "\r\n":
+        units -= 2 if ord(text[offset]) > 0xFFFF else 1
+        offset += 1
+    return offset
+
+
+def position_at(text: str, offset: int, starts: list[int] | None = None) -> dict:
+    starts = starts or line_starts(text)
+    line = bisect_right(starts, offset) - 1
+    line_text = text[starts[line] : offset]
+    character = sum(2 if ord(c) > 0xFFFF else 1 for c in line_text)
+    return {"line": line, "character": character}
+
+
+def paragraphs(text: str) -> list[tuple[int, str]]:
+    """Split the text on blank lines. Returns the offset and content of each paragraph, stripped."""
+
+    return [(m.start(), m.group()) for m in PARAGRAPH_RE.finditer(text)]
+
+
+def hunks(paragraph: str, corrected: str) -> list[tuple[int, str, str]]:
+    """Return the (offset, old, new) changes between a paragraph and its correction."""
+
+    result = []
+    offset = 0
+    for part in pair_up_diff(mk_diff(paragraph, corrected)):
+        if isinstance(part, tuple):
+            old, new = part
+            result.append((offset, old, new))
+            offset += len(old)
+        else:
+            offset += len(part)
+    return result
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+@dataclass
+class Document:
+    uri: str
+    text: str
+    version: int = 0
+    # content hash of a paragraph -> its hunks
+    results: dict[str, list[tuple[int, str, str]]] = field(default_factory=dict)
+    timer: threading.Timer | None = None
+    # Held while checking, so that checks of a document don't overlap.
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # Held while editing, so that text and version always match.
+    edit_lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def apply_change(self, change: dict):
+        if "range" not in change:
+            self.text = change["text"]
+            return
+
+        starts = line_starts(self.text)
+        start = offset_at(self.text, change["range"]["start"], starts)
+        end = offset_at(self.text, change["range"]["end"], starts)
+        self.text = self.text[:start] + change["text"] + self.text[end:]
+
+    def check(self, text: str, correct: Callable[[str], str]) -> list[tuple[int, str, str]]:
+        """Return the changes to make in the text, correcting only new paragraphs."""
+
+        changes = []
+        results = {}
+        for offset, paragraph in paragraphs(text):
+            key = content_hash(paragraph)
+            if key not in self.results:
+                # Saved right away, to keep what is done if a later paragraph fails.
+                self.results[key] = hunks(paragraph, correct(paragraph))
+            results[key] = self.results[key]
+            changes.extend((offset + start, old, new) for start, old, new in results[key])
+
+        # Forget paragraphs that are not in the document anymore.
+        self.results = results
+        return changes
+
+
+def llm_corrector(model: str | None = None) -> Callable[[str], str]:
+    import openai
+
+    from typofixer import constants
+    from typofixer.config import Config
+    from typofixer.llm import ai_stream
+    from typofixer.precheck import precheck
+
+    # Same client as the web app, to use the same API.
+    config = Config.load(constants.CONFIG_PATH)
+    client = openai.OpenAI(api_key=config.api_key, base_url=config.api_base)
+    model = model or os.getenv("TYPOFIXER_LSP_MODEL", constants.CHEAP_BUT_GOOD)
+    system = dedent(constants.SYSTEM_PROMPTS["Fix typos"]).strip()
+
+    def correct(text: str) -> str:
+        if constants.PRECHECK:
+            fixed = precheck(text, fix_trivial=constants.PRECHECK_FIX_TRIVIAL)
+            if fixed is not None:
+                return fixed
+        messages = [dict(role="user", content=text)]
+        return "".join(ai_stream(system, messages, model=model, client=client))
+
+    return correct
+
+
+class Server:
+    def __init__(
+        self,
+        correct: Callable[[str], str],
+        stdin: BinaryIO,
+        stdout: BinaryIO,
+        debounce: float = DEBOUNCE_SECONDS,
+    ):
+        self.correct = correct
+        self.stdin = stdin
+        self.stdout = stdout
+        self.debounce = debounce
+        self.documents: dict[str, Document] = {}
+        self.write_lock = threading.Lock()
+
+    # JSON-RPC
+
+    def read_message(self) -> dict | None:
+        length = None
+        while True:
+            line = self.stdin.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+
+        if length is None:
+            return None
+        return json.loads(self.stdin.read(length))
+
+    def send(self, message: dict):
+        body = json.dumps({"jsonrpc": "2.0", **message}).encode()
+        with self.write_lock:
+            self.stdout.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            self.stdout.flush()
+
+    def notify(self, method: str, params: dict):
+        self.send({"method": method, "params": params})
+
+    def serve(self):
+        while (message := self.read_message()) is not None:
+            method = message.get("method")
+            if method == "exit":
+                break
+
+            handler = getattr(self, "on_" + (method or "").replace("/", "_"), None)
+            if handler is None:
+                if "id" in message:
+                    self.send_error(message["id"], METHOD_NOT_FOUND, f"Unknown method {method}")
+                continue
+
+            try:
+                result = handler(message.get("params"))
+            except Exception as e:
+                # A bad message should not kill the server.
+                if "id" in message:
+                    self.send_error(message["id"], INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+                else:
+                    self.log(f"{method} failed: {type(e).__name__}: {e}")
+                continue
+
+            if "id" in message:
+                self.send({"id": message["id"], "result": result})
+
+    def send_error(self, id, code: int, message: str):
+        self.send({"id": id, "error": {"code": code, "message": message}})
+
+    def log(self, message: str):
+        self.notify("window/logMessage", {"type": 1, "message": f"typofixer: {message}"})
+
+    # Handlers, named after the LSP methods
+
+    def on_initialize(self, params):
+        return {
+            "capabilities": {
+                "textDocumentSync": {"openClose": True, "change": INCREMENTAL},
+                "codeActionProvider": True,
+            },
+            "serverInfo": {"name": "typofixer"},
+        }
+
+    def on_shutdown(self, params):
+        for document in self.documents.values():
+            if document.timer:
+                document.timer.cancel()
+        return None
+
+    def on_textDocument_didOpen(self, params):
+        item = params["textDocument"]
+        document = Document(item["uri"], item["text"], item.get("version", 0))
+        self.documents[document.uri] = document
+        self.schedule(document)
+
+    def on_textDocument_didChange(self, params):
+        document = self.documents[params["textDocument"]["uri"]]
+        with document.edit_lock:
+            for change in params["contentChanges"]:
+                document.apply_change(change)
+            document.version = params["textDocument"].get("version", document.version + 1)
+        self.schedule(document)
+
+    def on_textDocument_didClose(self, params):
+        document = self.documents.pop(params["textDocument"]["uri"])
+        if document.timer:
+            document.timer.cancel()
+        self.notify("textDocument/publishDiagnostics", {"uri": document.uri, "diagnostics": []})
+
+    def on_textDocument_codeAction(self, params):
+        uri = params["textDocument"]["uri"]
+        actions = []
+        for diagnostic in params["context"]["diagnostics"]:
+            # Not all clients send back the data of the diagnostics.
+            new = (diagnostic.get("data") or {}).get("new")
+            if diagnostic.get("source") != "typofixer" or new is None:
+                continue
+            actions.append(
+                {
+                    "title": f"Replace with “{new}”" if new else "Remove",
+                    "kind": "quickfix",
+                    "diagnostics": [diagnostic],
+                    "edit": {"changes": {uri: [{"range": diagnostic["range"], "newText": new}]}},
+                }
+            )
+        return actions
+
+    # Checking
+
+    def schedule(self, document: Document):
+        """(Re)start the timer that checks the document once edits stop."""
+
+        if document.timer:
+            document.timer.cancel()
+        document.timer = threading.Timer(self.debounce, self.publish, args=(document,))
+        document.timer.daemon = True
+        document.timer.start()
+
+    def publish(self, document: Document):
+        with document.lock:
+            with document.edit_lock:
+                text, version = document.text, document.version
+            try:
+                changes = document.check(text, self.correct)
+            except Exception as e:
+                self.log(str(e))
+                return
+
+        if document.version != version or document.uri not in self.documents:
+            # Edited while checking: the next check will publish up to date diagnostics.
+            return
+
+        starts = line_starts(text)
+        diagnostics = []
+        for offset, old, new in changes:
+            diagnostics.append(
+                {
+                    "range": {
+                        "start": position_at(text, offset, starts),
+                        "end": position_at(text, offset + len(old), starts),
+                    },
+                    "severity": 3,  # Information
+                    "source": "typofixer",
+                    "message": f"“{old}” → “{new}”",
+                    "data": {"new": new},
+                }
+            )
+
+        self.notify(
+            "textDocument/publishDiagnostics",
+            {"uri": document.uri, "version": version, "diagnostics": diagnostics},
+        )
+
+
+def main():
+    Server(llm_corrector(), sys.stdin.buffer, sys.stdout.buffer).serve()
@@ -1,15 +1,16 @@
-from pathlib import Path
 import random
 from textwrap import dedent
 import openai
-from pydantic import BaseModel
 import streamlit as st
 import streamlit.components.v1 as components
-import yaml
 
 import constants  # Needs to be imported first, as it loads the environment variables.
+from config import Config
 from formatting import mk_diff, fmt_diff_toggles
 from llm import ai_stream
+from precheck import precheck
+from router import Router
+from streaming import coalesce
 
 
 def setup_analytics():
@@ -21,24 +22,10 @@ def setup_analytics():
     )
 
 
-class Config(BaseModel):
-    api_base: str | None = None
-    api_key: str | None = None
-
-    @classmethod
-    def load(cls) -> "Config":
-        try:
-            path = Path(constants.CONFIG_PATH)
-            data = yaml.safe_load(path.read_text())
-            return cls.model_validate(data)
-        except FileNotFoundError:
-            return cls()
-
-
 def main():
     st.set_page_config(initial_sidebar_state="expanded", page_title="LLM Typo Fixer")
 
-    config = Config.load()
+    config = Config.load(constants.CONFIG_PATH)
     client = openai.OpenAI(
         api_key=config.api_key,
         base_url=config.api_base,
@@ -79,23 +66,8 @@ def main():
     # with st.sidebar:
     #     setup_analytics()  # Doesn't actually work
 
-    system_prompts = {
-        "Fix typos": """
-            You are given a text and you need to fix the language (typos, grammar, ...).
-            If needed, fix the formatting and, when relevant, ensure the text is inclusive.
-            Output directly the corrected text, without any comment.
-            """,
-        "Heavy fix": """
-            You are given a text and you need to fix the language (typos, grammar, ...).
-            If needed, fix the formatting and, when relevant, ensure the text is inclusive.
-            Please also reformulate the text when needed, use better words and make it more clear.
-            Output directly the corrected text, without any comment.
-            """,
-        "Custom": "",
-    }
-
     system_name = st.radio(
-        "Preset instructions for the LLM", list(system_prompts.keys()), horizontal=True
+        "Preset instructions for the LLM", list(constants.SYSTEM_PROMPTS.keys()), horizontal=True
     )
     assert system_name is not None  # For type checker
 
@@ -105,11 +77,11 @@ def main():
         if system_name == "Custom":
             system = st.text_area(
                 "Custom prompt",
-                value=dedent(system_prompts["Fix typos"]).strip(),
+                value=dedent(constants.SYSTEM_PROMPTS["Fix typos"]).strip(),
                 max_chars=constants.MAX_CHARS,
             )
         else:
-            system = dedent(system_prompts[system_name]).strip()
+            system = dedent(constants.SYSTEM_PROMPTS[system_name]).strip()
             st.code(system, language="text")
 
         text = st.text_area("Text to fix", max_chars=constants.MAX_CHARS)
@@ -120,7 +92,8 @@ def main():
         model_names.sort(key=lambda x: ("groq" not in x, x))
         model = st.selectbox(
             "Model",
-            model_names,
+            [*model_names, constants.AUTO_MODEL],
+            help="Auto uses the model that is currently the fastest.",
         )
         assert model is not None  # For the type checker.
 
@@ -130,19 +103,53 @@ def main():
     def cache():
         return {}
 
-    if lets_gooo:
-        corrected = st.write_stream(
-            ai_stream(
-                system,
-                [dict(role="user", content=text)],
-                model=model,
-                client=client,
-            )
+    @st.cache_resource()
+    def router():
+        return Router(constants.MODELS_COSTS, constants.MODELS_TIERS)
+
+    if lets_gooo and constants.PRECHECK and system_name == "Fix typos":
+        # Only plain typo fixing can be done without the LLM.
+        corrected = precheck(text, fix_trivial=constants.PRECHECK_FIX_TRIVIAL)
+    else:
+        corrected = None
+
+    if lets_gooo and corrected is not None:
+        locally = True
+        cache()[text, system] = corrected, locally
+    elif lets_gooo:
+        locally = False
+        messages = [dict(role="user", content=text)]
+        if model == constants.AUTO_MODEL:
+            # tiktoken may need to download its encoding, so only a rough estimate here.
+            input_tokens = len(system + text) // 4
+            try:
+                model = router().pick(
+                    model_names,
+                    input_tokens,
+                    min_tier=constants.AUTO_MIN_TIER,
+                    max_cost=constants.AUTO_MAX_COST,
+                )
+                st.caption(f"Using {model}")
+            except ValueError as e:
+                model = model_names[0]
+                st.warning(f"{e} Using {model} instead.")
+
+        # Render the stream in frames, instead of one websocket message per token,
+        # and show the diff in this same run once it's done.
+        placeholder = st.empty()
+        corrected = ""
+        frames = coalesce(
+            router().timed(model, ai_stream(system, messages, model=model, client=client)),
+            fps=constants.STREAM_FPS,
+            max_chars=constants.STREAM_MAX_CHARS,
         )
-        cache()[text, system] = corrected
-        st.rerun()
+        for frame in frames:
+            corrected += frame
+            placeholder.markdown(corrected)
+        placeholder.empty()
+        cache()[text, system] = corrected, locally
     else:
-        corrected = cache().get((text, system))
+        corrected, locally = cache().get((text, system), (None, False))
 
     dev_mode = st.sidebar.toggle("Developer mode")
     if dev_mode:
@@ -161,11 +168,19 @@ def main():
         with st.container(border=True):
             st.html(fmt_diff_toggles(diff, start_with_old_selected=selected == options[0]))
 
-        st.warning(
-            "This text was written by a generative AI model. You **ALWAYS** need to review it."
-        )
-
-        st.expander("LLM version of the text").text(corrected)
+        if locally:
+            st.info(
+                "No LLM was used: this text was only checked against a word list, "
+                "so grammar and style were not reviewed."
+                if corrected == text
+                else "No LLM was used: obvious typos were fixed using a word list."
+            )
+            st.expander("Locally fixed version of the text").text(corrected)
+        else:
+            st.warning(
+                "This text was written by a generative AI model. You **ALWAYS** need to review it."
+            )
+            st.expander("LLM version of the text").text(corrected)
     else:
         diff = "No diff yet"
 
@@ -0,0 +1,192 @@
+"""Offline check of a text, to skip the LLM when there is nothing (or almost nothing) to fix.
+
+Unknown words are looked up in a SymSpell-style index: every word of the list is
+stored under all the strings obtained by deleting up to `max_distance` characters,
+so that finding the candidates for a typo is a handful of dict lookups.
+"""
+
+from dataclasses import dataclass
+from functools import cache
+import os
+from pathlib import Path
+import re
+
+DEFAULT_WORDLIST = Path(__file__).parent / "words.txt"
+
+WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+
+# Typos are fixed locally only with a word list at least this large. With a small list,
+# most unknown words are valid words that happen to be one edit away from a listed one.
+TRUSTED_SIZE = 50_000
+
+
+def deletes(word: str, max_distance: int) -> set[str]:
+    """All the strings obtained by removing up to `max_distance` characters from `word`."""
+
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1 :] for w in frontier for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Optimal string alignment distance (Levenshtein with adjacent transpositions)."""
+
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(prev[j] + 1, current[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], prev2[j - 2] + 1)
+        prev2, prev = prev, current
+    return prev[-1]
+
+
+# Words that are never inflected with -s, -ed or -ing, so that "wass" or "thes" are typos.
+FUNCTION_WORDS = set(
+    """
+    a an the this that these those and but or nor for yet so if as at by in of off on out to up
+    from into onto with over under than then there here when where why how what who whom whose
+    which while i me my mine you your yours he him his she her hers it its we us our ours they
+    them their theirs is am are was were be been being has have had do does did can could may
+    might must shall should will would not no all any each few more most some such own same very
+    too also just only about after before again once both
+    """.split()
+)
+
+
+def base_forms(word: str) -> list[str]:
+    """Words that `word` could be an inflection of (plural, past tense, -ing form...).
+
+    To avoid hiding typos, bases must have at least 3 letters and not be function words,
+    and a plural -s is not added to a word that already ends with s.
+    """
+
+    forms = []
+    if word.endswith("'s"):
+        forms.append(word[:-2])
+    if word.endswith("ies"):
+        forms.append(word[:-3] + "y")
+    if re.search(r"(s|x|z|ch|sh|o)es$", word):
+        forms.append(word[:-2])
+    if word.endswith("s") and not word.endswith(("ss", "'s")):
+        forms.append(word[:-1])
+    if word.endswith("ied"):
+        forms.append(word[:-3] + "y")
+    for suffix in ("ed", "ing"):
+        if word.endswith(suffix):
+            stem = word[: -len(suffix)]
+            # liked -> like, stopped -> stop
+            forms += [stem, stem + "e"]
+            if len(stem) > 2 and stem[-1] == stem[-2]:
+                forms.append(stem[:-1])
+    return [form for form in forms if len(form) >= 3 and form not in FUNCTION_WORDS]
+
+
+class WordIndex:
+    """Deletion index over a word list, one lowercase word per line, most frequent first."""
+
+    def __init__(self, path: str | Path, max_distance: int = 1):
+        self.max_distance = max_distance
+        self.rank: dict[str, int] = {}
+        self.index: dict[str, list[str]] = {}
+
+        with open(path) as f:
+            for line in f:
+                word = line.strip()
+                if word and word not in self.rank:
+                    self.rank[word] = len(self.rank)
+                    for deleted in deletes(word, max_distance):
+                        self.index.setdefault(deleted, []).append(word)
+
+    def __len__(self) -> int:
+        return len(self.rank)
+
+    def __contains__(self, word: str) -> bool:
+        """Whether the word, or the word it is an inflection of, is in the list."""
+
+        word = word.lower()
+        return word in self.rank or any(form in self.rank for form in base_forms(word))
+
+    def suggest(self, word: str) -> list[str]:
+        """Return the closest known words, most frequent first."""
+
+        word = word.lower()
+        if word in self.rank:
+            return [word]
+
+        candidates = {
+            candidate
+            for deleted in deletes(word, self.max_distance)
+            for candidate in self.index.get(deleted, ())
+        }
+        distances = {c: edit_distance(word, c) for c in candidates}
+        distances = {c: d for c, d in distances.items() if d <= self.max_distance}
+        if not distances:
+            return []
+
+        best = min(distances.values())
+        return sorted((c for c, d in distances.items() if d == best), key=self.rank.__getitem__)
+
+
+@cache
+def load_index(path: str | None = None) -> WordIndex | None:
+    """Load the word index once per process. Returns None if there is no word list."""
+
+    path = path or os.getenv("TYPOFIXER_WORDLIST") or str(DEFAULT_WORDLIST)
+    if not os.path.exists(path):
+        return None
+    return WordIndex(path)
+
+
+@dataclass
+class Typo:
+    start: int
+    end: int
+    word: str
+    suggestions: list[str]
+
+
+def find_typos(text: str, index: WordIndex) -> list[Typo]:
+    """Return all the words of the text that are not in the index."""
+
+    typos = []
+    for match in WORD_RE.finditer(text):
+        word = match.group()
+        if word not in index:
+            typos.append(Typo(match.start(), match.end(), word, index.suggest(word)))
+    return typos
+
+
+def precheck(text: str, fix_trivial: bool = False, index: WordIndex | None = None) -> str | None:
+    """Try to correct the text without an LLM.
+
+    Returns the text itself if no issue is found, the corrected text if every typo
+    has a single obvious correction and `fix_trivial` is set, and None if the LLM is needed.
+    Typos are only fixed with a word list of at least TRUSTED_SIZE words.
+    """
+
+    index = index or load_index()
+    if index is None or not text.strip():
+        return None
+
+    typos = find_typos(text, index)
+    if not typos:
+        return text
+    if not fix_trivial or len(index) < TRUSTED_SIZE:
+        return None
+
+    corrected = ""
+    last = 0
+    for typo in typos:
+        # Capitalized unknown words are often names, and ambiguous typos are not trivial.
+        if len(typo.suggestions) != 1 or not typo.word.islower():
+            return None
+        corrected += text[last : typo.start] + typo.suggestions[0]
+        last = typo.end
+    return corrected + text[last:]
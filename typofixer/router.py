@@ -0,0 +1,156 @@
+"""Pick the model that currently answers the fastest, from the latency of the last requests."""
+
+from collections import deque
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Callable, Iterable, Iterator
+
+
+@dataclass
+class Sample:
+    ttft: float
+    tokens_per_second: float
+    error: bool
+    time: float = 0
+
+
+@dataclass
+class ModelStats:
+    """Rolling statistics over the last `window` requests to a model."""
+
+    window: int = 20
+    samples: deque[Sample] = field(default_factory=deque)
+
+    def add(self, sample: Sample):
+        self.samples.append(sample)
+        while len(self.samples) > self.window:
+            self.samples.popleft()
+
+    def forget_before(self, time: float):
+        while self.samples and self.samples[0].time < time:
+            self.samples.popleft()
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0
+        return sum(s.error for s in self.samples) / len(self.samples)
+
+    @property
+    def ttft(self) -> float:
+        ok = [s.ttft for s in self.samples if not s.error]
+        return sum(ok) / len(ok) if ok else 0
+
+    @property
+    def tokens_per_second(self) -> float:
+        ok = [s.tokens_per_second for s in self.samples if not s.error]
+        return sum(ok) / len(ok) if ok else 0
+
+    def expected_latency(self, output_tokens: int) -> float | None:
+        """Expected time to stream `output_tokens`, or None if there is no successful request yet."""
+
+        if not self.tokens_per_second:
+            return None
+        latency = self.ttft + output_tokens / self.tokens_per_second
+        # A failed request means retrying, so errors make a model slower on average.
+        return latency / (1 - self.error_rate) if self.error_rate < 1 else float("inf")
+
+
+class Router:
+    """Route requests to the fastest model that meets a quality tier and a cost ceiling.
+
+    Args:
+        costs: model -> (input cost, output cost) in $ per million tokens, like `MODELS_COSTS`.
+        tiers: model -> quality tier, higher is better. Models without a tier are never picked.
+        max_age: seconds after which a request is not taken into account anymore, so that
+            models that failed or were slow get tried again.
+    """
+
+    MAX_ERROR_RATE = 0.5
+
+    def __init__(
+        self,
+        costs: dict[str, tuple[float, float]],
+        tiers: dict[str, int],
+        window: int = 20,
+        max_age: float = 600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.costs = costs
+        self.tiers = tiers
+        self.window = window
+        self.max_age = max_age
+        self.clock = clock
+        self.stats: dict[str, ModelStats] = {}
+        self.lock = threading.Lock()
+
+    def record(self, model: str, ttft: float, tokens_per_second: float, error: bool = False):
+        with self.lock:
+            stats = self.stats.setdefault(model, ModelStats(self.window))
+            stats.add(Sample(ttft, tokens_per_second, error, self.clock()))
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
+        input_cost, output_cost = self.costs.get(model, (0, 0))
+        return (input_cost * input_tokens + output_cost * output_tokens) / 1_000_000
+
+    def pick(
+        self,
+        available: Iterable[str],
+        input_tokens: int,
+        min_tier: int = 0,
+        max_cost: float | None = None,
+    ) -> str:
+        """Return the model expected to answer the fastest.
+
+        For typo fixing, the output is about as long as the input.
+        Models never tried yet are picked first, in the order given, to measure them.
+        """
+
+        candidates = []
+        for model in available:
+            if self.tiers.get(model, -1) < min_tier:
+                continue
+            if max_cost is not None and self.cost(model, input_tokens, input_tokens) > max_cost:
+                continue
+            candidates.append(model)
+
+        if not candidates:
+            raise ValueError(f"No model of tier {min_tier} or more costs less than {max_cost}$.")
+
+        def key(model: str) -> float:
+            stats = self.stats.get(model)
+            if stats is None or not stats.samples:
+                return -1
+            if stats.error_rate > self.MAX_ERROR_RATE:
+                return float("inf")
+            latency = stats.expected_latency(input_tokens)
+            return float("inf") if latency is None else latency
+
+        with self.lock:
+            for stats in self.stats.values():
+                stats.forget_before(self.clock() - self.max_age)
+            return min(candidates, key=key)
+
+    def timed(self, model: str, stream: Iterable[str]) -> Iterator[str]:
+        """Pass through a stream of text, recording its latency for `model`."""
+
+        start = self.clock()
+        first = None
+        chars = 0
+        try:
+            for text in stream:
+                if first is None:
+                    first = self.clock()
+                chars += len(text)
+                yield text
+        except Exception:
+            self.record(model, self.clock() - start, 0, error=True)
+            raise
+
+        end = self.clock()
+        first = end if first is None else first
+        # About 4 characters per token, good enough to compare models.
+        tokens = chars / 4
+        duration = max(end - first, 1e-3)
+        self.record(model, first - start, tokens / duration)
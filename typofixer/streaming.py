@@ -0,0 +1,31 @@
+import time
+from typing import Callable, Iterable, Iterator
+
+
+def coalesce(
+    chunks: Iterable[str],
+    fps: float = 20,
+    max_chars: int | None = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> Iterator[str]:
+    """Group small chunks of a stream into frames.
+
+    A frame is emitted at most `fps` times per second, or as soon as it holds
+    `max_chars` characters. The concatenation of the frames is always the
+    concatenation of the chunks.
+    """
+
+    interval = 1 / fps if fps > 0 else 0
+    buffer = ""
+    last_emit = clock()
+
+    for chunk in chunks:
+        buffer += chunk
+        now = clock()
+        if now - last_emit >= interval or (max_chars is not None and len(buffer) >= max_chars):
+            yield buffer
+            buffer = ""
+            last_emit = now
+
+    if buffer:
+        yield buffer
@@ -1,6 +1,7 @@
 # %%
 from abc import ABC, abstractmethod
 from collections import namedtuple
+from functools import cached_property
 import json
 import os
 from pathlib import Path
@@ -12,7 +13,8 @@ import threading
 
 import constants
 
-Usage = namedtuple("Usage", ["input_tokens", "output_tokens"])
+# cached_input_tokens are the part of input_tokens read from the provider's prompt cache.
+Usage = namedtuple("Usage", ["input_tokens", "output_tokens", "cached_input_tokens"], defaults=[0])
 
 
 def threaded(func):
@@ -26,7 +28,13 @@ def threaded(func):
 class UsageTracker(ABC):
     @abstractmethod
     def log_call(
-        self, model: str, input_text: str, output_text: str, input_tokens: int, output_tokens: int
+        self,
+        model: str,
+        input_text: str,
+        output_text: str,
+        input_tokens: int,
+        output_tokens: int,
+        cached_input_tokens: int = 0,
     ):
         pass
 
@@ -40,15 +48,13 @@ class UsageTracker(ABC):
         total_usage = {}
         for data in self.get_data_since(since):
             model = data["model"]
-            input_tokens = data["input_tokens"]
-            output_tokens = data["output_tokens"]
-
-            if model not in total_usage:
-                total_usage[model] = Usage(0, 0)
+            usage = total_usage.get(model, Usage(0, 0))
 
             total_usage[model] = Usage(
-                total_usage[model].input_tokens + input_tokens,
-                total_usage[model].output_tokens + output_tokens,
+                usage.input_tokens + data["input_tokens"],
+                usage.output_tokens + data["output_tokens"],
+                # Older records have no cached tokens.
+                usage.cached_input_tokens + (data.get("cached_input_tokens") or 0),
             )
 
         return total_usage
@@ -59,7 +65,12 @@ class UsageTracker(ABC):
         total_cost = 0
         for model, usage in self.total_usage(since).items():
             input_cost, output_cost = constants.MODELS_COSTS.get(model, (0, 0))
-            total_cost += input_cost * usage.input_tokens + output_cost * usage.output_tokens
+            cached_cost = constants.MODELS_CACHED_INPUT_COSTS.get(model, input_cost)
+            total_cost += (
+                input_cost * (usage.input_tokens - usage.cached_input_tokens)
+                + cached_cost * usage.cached_input_tokens
+                + output_cost * usage.output_tokens
+            )
 
         return total_cost / 1_000_000
 
@@ -67,6 +78,19 @@ class UsageTracker(ABC):
     def requests_count(self, since: int) -> int:
         """Return the number of requests since the given timestamp."""
 
+    def export_columnar(self, directory: str, since: float | None = None):
+        """Append the usage since the given timestamp to a columnar store, for analytics.
+
+        By default, only the records newer than the last one of the store are added.
+        """
+
+        from usage_store import ColumnarUsageStore
+
+        store = ColumnarUsageStore(directory)
+        if since is None:
+            since = store.last_date()
+        store.append(self.get_data_since(since))
+
 
 class FileUsageTracker(UsageTracker):
 
@@ -74,7 +98,13 @@ class FileUsageTracker(UsageTracker):
         self.log_file = log_file
 
     def log_call(
-        self, model: str, input_text: str, output_text: str, input_tokens: int, output_tokens: int
+        self,
+        model: str,
+        input_text: str,
+        output_text: str,
+        input_tokens: int,
+        output_tokens: int,
+        cached_input_tokens: int = 0,
     ):
         data = {
             "model": model,
@@ -82,6 +112,7 @@ class FileUsageTracker(UsageTracker):
             "output_length": len(output_text),
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
+            "cached_input_tokens": cached_input_tokens,
             "date_created": time.time(),
         }
 
@@ -110,30 +141,55 @@ class DirectusUsageTracker(UsageTracker):
         self.collection = collection
         self.token = token
 
+    @cached_property
+    def has_cached_tokens_field(self) -> bool:
+        """Whether the collection was migrated to have the cached_input_tokens field."""
+
+        url = f"{self.domain}/fields/{self.collection}/cached_input_tokens"
+        response = requests.get(url, headers={"Authorization": f"Bearer {self.token}"})
+        return response.ok
+
     def log_call(
-        self, model: str, input_text: str, output_text: str, input_tokens: int, output_tokens: int
+        self,
+        model: str,
+        input_text: str,
+        output_text: str,
+        input_tokens: int,
+        output_tokens: int,
+        cached_input_tokens: int = 0,
     ):
         url = f"{self.domain}/items/{self.collection}"
 
+        data = {
+            "model": model,
+            "input_length": len(input_text),
+            "output_length": len(output_text),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+        }
+        if self.has_cached_tokens_field:
+            data["cached_input_tokens"] = cached_input_tokens
+
         response = requests.post(
             url,
-            json={
-                "model": model,
-                "input_length": len(input_text),
-                "output_length": len(output_text),
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-            },
+            json=data,
             headers={"Authorization": f"Bearer {self.token}"},
         )
         response.raise_for_status()
 
-    def timestamp_to_directus(self, timestamp: int) -> str:
-        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(timestamp))
+    def timestamp_to_directus(self, timestamp: float) -> str:
+        seconds, milliseconds = divmod(round(timestamp * 1000), 1000)
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{milliseconds:03d}"
 
     def get_data_since(self, since: int) -> Iterator[dict]:
         since = self.timestamp_to_directus(since)
-        url = f"{self.domain}/items/{self.collection}?filter[date_created][_gt]={since}"
+        # Without a limit, Directus only returns the first 100 items.
+        url = (
+            f"{self.domain}/items/{self.collection}"
+            f"?filter[date_created][_gt]={since}"
+            f"&sort=date_created"
+            f"&limit=-1"
+        )
         response = requests.get(url, headers={"Authorization": f"Bearer {self.token}"})
         response.raise_for_status()
 
@@ -148,6 +204,8 @@ class DirectusUsageTracker(UsageTracker):
             f"&aggregate[sum]=input_tokens"
             f"&aggregate[sum]=output_tokens"
         )
+        if self.has_cached_tokens_field:
+            url += "&aggregate[sum]=cached_input_tokens"
         response = requests.get(url, headers={"Authorization": f"Bearer {self.token}"})
         response.raise_for_status()
         print(response.json())
@@ -157,8 +215,9 @@ class DirectusUsageTracker(UsageTracker):
             model = data["model"]
             input_tokens = data["sum"]["input_tokens"]
             output_tokens = data["sum"]["output_tokens"]
+            cached_input_tokens = data["sum"].get("cached_input_tokens") or 0
 
-            total_usage[model] = Usage(input_tokens, output_tokens)
+            total_usage[model] = Usage(input_tokens, output_tokens, cached_input_tokens)
 
         return total_usage
 
@@ -0,0 +1,187 @@
+"""Columnar storage of usage records, for fast analytics with NumPy.
+
+Each field is stored in its own file of fixed-width values, records are only
+ever appended, and reading memory-maps the files. Records are expected to be
+appended in chronological order, so that time ranges are found by bisection.
+"""
+
+import calendar
+import json
+import os
+from pathlib import Path
+import re
+import time
+from typing import Iterable
+
+import numpy as np
+
+COLUMNS = {
+    "date_created": np.float64,
+    "model": np.uint16,
+    "input_length": np.int32,
+    "output_length": np.int32,
+    "input_tokens": np.int32,
+    "output_tokens": np.int32,
+    "cached_input_tokens": np.int32,
+}
+
+
+def parse_directus_date(date: str) -> float:
+    """Convert an ISO date from Directus, like 2024-08-21T10:00:00.123Z, to a timestamp."""
+
+    timestamp = calendar.timegm(time.strptime(date[:19], "%Y-%m-%dT%H:%M:%S"))
+    fraction = re.match(r"\.\d+", date[19:])
+    return timestamp + (float(fraction.group()) if fraction else 0)
+
+
+class ColumnarUsageStore:
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.models_file = self.directory / "models.json"
+
+        if self.models_file.exists():
+            self.models: list[str] = json.loads(self.models_file.read_text())
+        else:
+            self.models = []
+
+    def column_path(self, name: str) -> Path:
+        return self.directory / f"{name}.{np.dtype(COLUMNS[name]).str.lstrip('<>|=')}"
+
+    def model_id(self, model: str) -> int:
+        if model not in self.models:
+            self.models.append(model)
+            self.models_file.write_text(json.dumps(self.models))
+        return self.models.index(model)
+
+    def append(self, records: Iterable[dict]):
+        """Append records with the same fields as the ones of the usage trackers."""
+
+        size = len(self)
+        columns = {name: [] for name in COLUMNS}
+        for record in records:
+            for name in COLUMNS:
+                # Fields missing from older records are null in Directus.
+                value = record.get(name) or 0
+                if name == "model":
+                    value = self.model_id(value)
+                elif name == "date_created" and isinstance(value, str):
+                    value = parse_directus_date(value)
+                columns[name].append(value)
+
+        for name, values in columns.items():
+            missing = size - self.stored_size(name)
+            with open(self.column_path(name), "ab") as f:
+                if missing > 0:
+                    # Column added after the store was created: zero for the previous records.
+                    f.write(np.zeros(missing, dtype=COLUMNS[name]).tobytes())
+                f.write(np.asarray(values, dtype=COLUMNS[name]).tobytes())
+
+    def stored_size(self, name: str) -> int:
+        path = self.column_path(name)
+        if not path.exists():
+            return 0
+        return os.path.getsize(path) // np.dtype(COLUMNS[name]).itemsize
+
+    def __len__(self) -> int:
+        return self.stored_size("date_created")
+
+    def last_date(self) -> float:
+        """Return the creation date of the last record, or 0 if there is none."""
+
+        dates = self.columns()["date_created"]
+        return float(dates[-1]) if len(dates) else 0
+
+    def read_column(self, name: str, size: int) -> np.ndarray:
+        """Memory-map a column, or read it padded with zeros if it is missing values."""
+
+        dtype = COLUMNS[name]
+        stored = min(self.stored_size(name), size)
+        if stored == size:
+            return np.memmap(self.column_path(name), dtype=dtype, mode="r", shape=(size,))
+
+        column = np.zeros(size, dtype=dtype)
+        if stored:
+            path = self.column_path(name)
+            column[:stored] = np.memmap(path, dtype=dtype, mode="r", shape=(stored,))
+        return column
+
+    def columns(self, since: float | None = None) -> dict[str, np.ndarray]:
+        """Return memory-mapped columns of the records created after `since`, or of all of them."""
+
+        size = len(self)
+        if size == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+        data = {name: self.read_column(name, size) for name in COLUMNS}
+        if since is None:
+            return data
+        start = np.searchsorted(data["date_created"], since, side="right")
+        return {name: column[start:] for name, column in data.items()}
+
+
+def histogram_by_time(
+    timestamps: np.ndarray, bucket: float = 3600, weights: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """Count (or sum the weights of) the records in each time bucket.
+
+    Returns:
+        The start of each bucket and the count in it. Empty buckets are included.
+    """
+
+    if len(timestamps) == 0:
+        return np.empty(0), np.empty(0)
+
+    first = np.floor(timestamps[0] / bucket) * bucket
+    indices = ((timestamps - first) // bucket).astype(np.int64)
+    counts = np.bincount(indices, weights=weights)
+    return first + bucket * np.arange(len(counts)), counts
+
+
+def percentiles(values: np.ndarray, q=(50, 90, 99)) -> dict[float, float]:
+    if len(values) == 0:
+        return {p: float("nan") for p in q}
+    return dict(zip(q, np.percentile(values, q).tolist()))
+
+
+def cost_per_day(
+    store: ColumnarUsageStore,
+    costs: dict[str, tuple[float, float]],
+    since: float | None = None,
+    cached_costs: dict[str, float] | None = None,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Return the start of each day, and the cost in $ for each model on each day.
+
+    Args:
+        costs: model -> (input cost, output cost) in $ per million tokens, like `MODELS_COSTS`.
+        cached_costs: model -> cost of cached input tokens, like `MODELS_CACHED_INPUT_COSTS`.
+            Cached tokens cost as much as the others for models not in it.
+    """
+
+    cached_costs = cached_costs or {}
+    columns = store.columns(since)
+    prices = []
+    for name in store.models:
+        input_cost, output_cost = costs.get(name, (0, 0))
+        prices.append((input_cost, output_cost, cached_costs.get(name, input_cost)))
+    prices = np.array(prices or [(0, 0, 0)]) / 1_000_000
+
+    model = columns["model"]
+    cached = columns["cached_input_tokens"]
+    record_costs = (
+        prices[model, 0] * (columns["input_tokens"] - cached)
+        + prices[model, 2] * cached
+        + prices[model, 1] * columns["output_tokens"]
+    )
+
+    days, _ = histogram_by_time(columns["date_created"], 86400)
+    if len(days) == 0:
+        return days, {name: np.empty(0) for name in store.models}
+
+    # One bin per (day, model) pair.
+    day = ((columns["date_created"] - days[0]) // 86400).astype(np.int64)
+    bins = day * len(store.models) + model
+    daily = np.bincount(bins, weights=record_costs, minlength=len(days) * len(store.models))
+    daily = daily.reshape(len(days), len(store.models))
+
+    return days, {name: daily[:, i] for i, name in enumerate(store.models)}